@@ -1,18 +1,36 @@
 
 from max30102 import MAX30102
-import hrcalc
+from hrcalc_numba import calc_hr_and_spo2_ring
+from sensor_stats import finger_stats, ingest
+from collections import deque
+import queue
 import threading
 import time
 import numpy as np
 
+# RPi.GPIO is only needed to wait on the sensor's INT pin; without it we poll
+try:
+    import RPi.GPIO as GPIO
+except (ImportError, RuntimeError):
+    GPIO = None
+
 class HeartRateMonitor(object):
     """
     A class that encapsulates the max30102 device into a thread
     """
 
-    LOOP_TIME = 0.01
+    # FIFO output rate: 100 sps with 4-sample averaging (see MAX30102.setup)
+    SAMPLE_RATE = 25
+    # when polling, sleep until about this many samples are waiting
+    POLL_BATCH = 4
+    # longest single wait on the INT pin, so the stop flag is still checked
+    INT_TIMEOUT = 0.05
+    # number of samples handed to hrcalc (BUFFER_SIZE in hrcalc)
+    WINDOW_SIZE = 100
+    # new samples between HR/SpO2 updates (once a second at SAMPLE_RATE)
+    CALC_INTERVAL = 25
 
-    def __init__(self, print_raw=False, print_result=False):
+    def __init__(self, print_raw=False, print_result=False, int_pin=None):
         self.bpm = 0
         self.spo2 = 0
         self.temperature = 0.0
@@ -22,55 +40,148 @@ class HeartRateMonitor(object):
         self.print_raw = print_raw
         self.print_result = print_result
 
+        # BCM number of the GPIO wired to the sensor's INT pin (None = poll)
+        if int_pin is not None and GPIO is None:
+            print('RPi.GPIO not available, polling the sensor instead')
+            int_pin = None
+        self._int_pin = int_pin
+
+        # console output goes through a queue to a separate thread, so a slow
+        # stdout (e.g. over SSH) never stalls the sensor thread
+        self._log_q = queue.Queue()
+        # set whenever a new bpm average is published, see wait_for_reading()
+        self._new_reading = threading.Event()
+
+        # sliding window of the last WINDOW_SIZE samples, kept as ring buffers
+        # so adding a sample never shifts the window
+        self._ir = np.zeros(self.WINDOW_SIZE, np.uint32)
+        self._red = np.zeros(self.WINDOW_SIZE, np.uint32)
+        self._reset_window()
+
+        # compile (or load from cache) hrcalc here, before the sensor is
+        # created: MAX30102() starts sampling and the FIFO does not roll over,
+        # so a first-run compile inside run_sensor would let it overflow
+        calc_hr_and_spo2_ring(self._ir, self._red, 0)
+
+    def _reset_window(self):
+        self._ir.fill(0)
+        self._red.fill(0)
+        self._idx = 0
+        self._filled = False
+        # samples ingested since the last finger check / hrcalc run
+        self._since_calc = 0
+
+    def _ingest(self, buf):
+        """
+        Decode a raw FIFO burst into the ring buffers, evicting the oldest samples.
+        The burst must be shorter than the window (the FIFO holds 32 samples).
+        Returns the ring index of the first new sample.
+        """
+        start = self._idx
+        self._idx = ingest(buf, self._ir, self._red, start)
+        if start + buf.shape[0] // 6 >= self.WINDOW_SIZE:
+            self._filled = True
+        return start
+
+    def _log(self, fmt, *args):
+        """
+        Queue fmt.format(*args) for printing on the log thread.
+        """
+        self._log_q.put_nowait((fmt, args))
+
+    def _log_worker(self):
+        while True:
+            item = self._log_q.get()
+            if item is None:
+                break
+            fmt, args = item
+            print(fmt.format(*args))
+
+    def _wait_for_data(self):
+        """
+        Block until the sensor should have a batch of samples ready.
+        Returns False if an INT wait timed out and there is nothing to read.
+        """
+        if self._int_pin is None:
+            time.sleep(self.POLL_BATCH / self.SAMPLE_RATE)
+            return True
+        # INT is active low and stays low until the interrupt status is read,
+        # so only wait for an edge if it is not already asserted
+        if GPIO.input(self._int_pin) == GPIO.LOW:
+            return True
+        timeout_ms = int(self.INT_TIMEOUT * 1000)
+        return GPIO.wait_for_edge(self._int_pin, GPIO.FALLING, timeout=timeout_ms) is not None
+
     def run_sensor(self):
         sensor = MAX30102()
-        ir_data = []
-        red_data = []
-        bpms = []
-        bpm_avg_list = []
+        if self._int_pin is not None:
+            # only interrupt on FIFO almost full, so we wake once per batch
+            sensor.enable_fifo_full_interrupt()
+            GPIO.setmode(GPIO.BCM)
+            GPIO.setup(self._int_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        self._reset_window()
+        # recent accepted beats and their running sum
+        bpms = deque(maxlen=8)  # Increased from 4 to 8 for better averaging
+        bpm_sum = 0.0
         last_print = time.time()
         last_temp_read = time.time()
 
         # run until told to stop
         while not self._thread.stopped:
+            # sleep until there should be data, without touching the I2C bus
+            if not self._wait_for_data():
+                continue
             # check if any data is available
             num_bytes = sensor.get_data_present()
+            if num_bytes == 0 and self._int_pin is not None:
+                # INT was asserted but there is nothing to read: clear the
+                # interrupt status and back off, so a stuck INT line cannot
+                # turn the loop into a busy spin
+                sensor.clear_interrupts()
+                time.sleep(self.INT_TIMEOUT)
+                continue
             if num_bytes > 0:
-                # grab all the data and stash it into arrays
-                while num_bytes > 0:
-                    red, ir = sensor.read_fifo()
-                    num_bytes -= 1
-                    ir_data.append(ir)
-                    red_data.append(red)
-                    if self.print_raw:
-                        print("{0}, {1}".format(ir, red))
-
-                while len(ir_data) > 100:
-                    ir_data.pop(0)
-                    red_data.pop(0)
-
-                if len(ir_data) == 100:
-                    bpm, valid_bpm, spo2, valid_spo2 = hrcalc.calc_hr_and_spo2(ir_data, red_data)
-                    
+                # grab all the data in one transfer and decode it into the window
+                start = self._ingest(sensor.read_fifo_raw(num_bytes))
+                self._since_calc += num_bytes
+                if self.print_raw:
+                    for i in range(num_bytes):
+                        j = (start + i) % self.WINDOW_SIZE
+                        self._log("{0}, {1}", self._ir[j], self._red[j])
+
+                # heart rate changes over seconds, so only re-run the
+                # calculation once enough new samples have slid in
+                if self._filled and self._since_calc >= self.CALC_INTERVAL:
+                    self._since_calc = 0
                     # Check for finger presence with better signal quality detection
-                    ir_mean = np.mean(ir_data)
-                    red_mean = np.mean(red_data)
-                    ir_std = np.std(ir_data)
+                    ir_mean, ir_std, red_mean, red_std = finger_stats(self._ir, self._red)
                     
                     # Finger detected if: high DC value AND signal has variation (not flat)
-                    finger_detected = (ir_mean > 50000 and ir_std > 100) or (red_mean > 50000 and np.std(red_data) > 100)
+                    finger_detected = (ir_mean > 50000 and ir_std > 100) or (red_mean > 50000 and red_std > 100)
                     self.finger_detected = finger_detected
                     
-                    if valid_bpm and finger_detected:
+                    if not finger_detected:
+                        # no point running peak detection on an empty sensor
+                        self.bpm = 0
+                        self.spo2 = 0
+                        if self.print_result:
+                            self._log("Finger not detected")
+                        continue
+
+                    # the oldest sample sits at the write index
+                    bpm, valid_bpm, spo2, valid_spo2 = calc_hr_and_spo2_ring(self._ir, self._red, self._idx)
+                    
+                    if valid_bpm:
                         # Reject outlier readings (unrealistic heart rates)
                         if 40 <= bpm <= 180:  # Normal human range
                             # Additional check: reject readings that are too different from recent average
-                            if len(bpms) == 0 or abs(bpm - np.mean(bpms)) < 30:  # Within 30 bpm of average
+                            if len(bpms) == 0 or abs(bpm - bpm_sum / len(bpms)) < 30:  # Within 30 bpm of average
+                                if len(bpms) == bpms.maxlen:
+                                    bpm_sum -= bpms[0]  # about to be evicted
                                 bpms.append(bpm)
-                                while len(bpms) > 8:  # Increased from 4 to 8 for better averaging
-                                    bpms.pop(0)
-                                self.bpm = np.mean(bpms)
-                                bpm_avg_list.append(self.bpm)
+                                bpm_sum += bpm
+                                self.bpm = bpm_sum / len(bpms)
+                                self._new_reading.set()
                         
                         # Store SpO2 value if valid
                         if valid_spo2 and 85 <= spo2 <= 100:  # Stricter SpO2 range
@@ -85,23 +196,27 @@ class HeartRateMonitor(object):
                                 pass  # Keep last valid temperature
                         
                         if self.print_result:
-                            if time.time() - last_print >= 5 and len(bpm_avg_list) > 0:
-                                avg_bpm = sum(bpm_avg_list) / len(bpm_avg_list)
-                                print("BPM (5s avg): {0:.1f},  SpO2: {1}, Temp: {2}°C".format(avg_bpm, spo2, self.temperature))
-                                bpm_avg_list = []
+                            # self.bpm is already the average of the last 8 beats
+                            if time.time() - last_print >= 5 and self.bpm > 0:
+                                self._log("BPM: {0:.1f},  SpO2: {1}, Temp: {2}°C", self.bpm, self.spo2, self.temperature)
                                 last_print = time.time()
-                    elif not finger_detected:
-                        self.bpm = 0
-                        self.spo2 = 0
-                        self.finger_detected = False
-                        if self.print_result:
-                            print("Finger not detected")
-
-            time.sleep(self.LOOP_TIME)
 
         sensor.shutdown()
+        if self._int_pin is not None:
+            GPIO.cleanup(self._int_pin)
+
+    def wait_for_reading(self, timeout=None):
+        """
+        Block until the sensor thread publishes a new bpm reading, or timeout.
+        Returns True if a new reading arrived.
+        """
+        got = self._new_reading.wait(timeout)
+        self._new_reading.clear()
+        return got
 
     def start_sensor(self):
+        self._log_thread = threading.Thread(target=self._log_worker, daemon=True)
+        self._log_thread.start()
         self._thread = threading.Thread(target=self.run_sensor)
         self._thread.stopped = False
         self._thread.start()
@@ -113,3 +228,6 @@ class HeartRateMonitor(object):
         self.temperature = 0.0
         self.finger_detected = False
         self._thread.join(timeout)
+        # sentinel: flush what is queued, then end the log thread
+        self._log_q.put(None)
+        self._log_thread.join(timeout)
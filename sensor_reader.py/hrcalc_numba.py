@@ -0,0 +1,237 @@
+# -*-coding:utf-8
+
+# numba port of hrcalc.py, step for step, so results match the reference
+# implementation (checked by hrcalc_parity.py). Takes uint32 ring buffers
+# instead of lists.
+
+import numpy as np
+import numba
+
+# 25 samples per second (in algorithm.h)
+SAMPLE_FREQ = 25
+# taking moving average of 4 samples when calculating HR
+# in algorithm.h, "DONOT CHANGE" comment is attached
+MA_SIZE = 4
+# sampling frequency * 4 (in algorithm.h)
+BUFFER_SIZE = 100
+# find_peaks parameters used by calc_hr_and_spo2_ring
+MIN_DIST = 4
+MAX_NUM = 15
+
+
+@numba.njit(cache=True)
+def calc_hr_and_spo2_ring(ir_ring, red_ring, start):
+    """
+    By detecting  peaks of PPG cycle and corresponding AC/DC
+    of red/infra-red signal, the an_ratio for the SPO2 is computed.
+    The windows are ring buffers whose oldest sample is at index `start`,
+    so the caller does not have to copy them into order first.
+    Returns (hr, hr_valid, spo2, spo2_valid), as hrcalc.calc_hr_and_spo2.
+    """
+    # the algorithm does signed arithmetic on the samples
+    ir = _unroll(ir_ring, start)
+    red = _unroll(red_ring, start)
+
+    x = _inverted_ma(ir)
+
+    # calculate threshold
+    n_th = _dc_mean(x)
+    n_th = 30 if n_th < 30 else n_th  # min allowed
+    n_th = 60 if n_th > 60 else n_th  # max allowed
+
+    ir_valley_locs, n_peaks = _find_peaks(x, BUFFER_SIZE, n_th, MIN_DIST, MAX_NUM)
+
+    hr, hr_valid = _calc_hr(ir_valley_locs, n_peaks)
+    spo2, spo2_valid = _calc_spo2(ir, red, ir_valley_locs, n_peaks)
+    return hr, hr_valid, spo2, spo2_valid
+
+
+@numba.njit(cache=True)
+def _unroll(ring, start):
+    """
+    Copy a ring buffer into an oldest-first int64 array.
+    """
+    n = ring.shape[0]
+    out = np.empty(n, np.int64)
+    head = n - start
+    for i in range(head):
+        out[i] = ring[start + i]
+    for i in range(start):
+        out[head + i] = ring[i]
+    return out
+
+
+@numba.njit(cache=True)
+def _dc_mean(a):
+    """
+    int(np.mean(a)) of an int64 buffer
+    """
+    total = 0
+    for i in range(a.shape[0]):
+        total += a[i]
+    return int(total / a.shape[0])
+
+
+@numba.njit(cache=True)
+def _inverted_ma(ir):
+    """
+    Remove DC mean and invert the signal (so the peak detector finds valleys),
+    then take the in-place 4 point moving average.
+    """
+    ir_mean = _dc_mean(ir)
+    x = -1 * (ir - ir_mean)
+    for i in range(x.shape[0] - MA_SIZE):
+        s = 0
+        for k in range(i, i + MA_SIZE):
+            s += x[k]
+        # x holds ints, so the average is truncated like the reference
+        x[i] = int(s / MA_SIZE)
+    return x
+
+
+@numba.njit(cache=True)
+def _calc_hr(ir_valley_locs, n_peaks):
+    if n_peaks >= 2:
+        peak_interval_sum = 0
+        for i in range(1, n_peaks):
+            peak_interval_sum += (ir_valley_locs[i] - ir_valley_locs[i-1])
+        peak_interval_sum = int(peak_interval_sum / (n_peaks - 1))
+        return int(SAMPLE_FREQ * 60 / peak_interval_sum), True
+    # unable to calculate because # of peaks are too small
+    return -999, False
+
+
+@numba.njit(cache=True)
+def _calc_spo2(ir_data, red_data, ir_valley_locs, n_peaks):
+    # find precise min near ir_valley_locs (???)
+    exact_ir_valley_locs_count = n_peaks
+
+    for i in range(exact_ir_valley_locs_count):
+        if ir_valley_locs[i] > BUFFER_SIZE:
+            return -999.0, False  # do not use SPO2 since valley loc is out of range
+
+    i_ratio_count = 0
+    ratio = np.zeros(5, np.int64)
+
+    # find max between two valley locations
+    # and use ratio between AC component of Ir and Red DC component of Ir and Red for SpO2
+    red_dc_max_index = -1
+    ir_dc_max_index = -1
+    for k in range(exact_ir_valley_locs_count-1):
+        red_dc_max = -16777216
+        ir_dc_max = -16777216
+        v0 = ir_valley_locs[k]
+        v1 = ir_valley_locs[k+1]
+        if v1 - v0 > 3:
+            for i in range(v0, v1):
+                if ir_data[i] > ir_dc_max:
+                    ir_dc_max = ir_data[i]
+                    ir_dc_max_index = i
+                if red_data[i] > red_dc_max:
+                    red_dc_max = red_data[i]
+                    red_dc_max_index = i
+
+            red_ac = int((red_data[v1] - red_data[v0]) * (red_dc_max_index - v0))
+            red_ac = red_data[v0] + int(red_ac / (v1 - v0))
+            red_ac = red_data[red_dc_max_index] - red_ac  # subtract linear DC components from raw
+
+            ir_ac = int((ir_data[v1] - ir_data[v0]) * (ir_dc_max_index - v0))
+            ir_ac = ir_data[v0] + int(ir_ac / (v1 - v0))
+            ir_ac = ir_data[ir_dc_max_index] - ir_ac  # subtract linear DC components from raw
+
+            nume = red_ac * ir_dc_max
+            denom = ir_ac * red_dc_max
+            if (denom > 0 and i_ratio_count < 5) and nume != 0:
+                # same 32-bit wrap as the reference (see hrcalc.py)
+                ratio[i_ratio_count] = int(((nume * 100) & 0xffffffff) / denom)
+                i_ratio_count += 1
+
+    # choose median value since PPG signal may vary from beat to beat
+    ratio = np.sort(ratio[:i_ratio_count])  # sort to ascending order
+    mid_index = int(i_ratio_count / 2)
+
+    ratio_ave = 0
+    if mid_index > 1:
+        ratio_ave = int((ratio[mid_index-1] + ratio[mid_index])/2)
+    else:
+        if i_ratio_count != 0:
+            ratio_ave = ratio[mid_index]
+
+    if ratio_ave > 2 and ratio_ave < 184:
+        # -45.060 * ratioAverage * ratioAverage / 10000 + 30.354 * ratioAverage / 100 + 94.845
+        spo2 = -45.060 * (ratio_ave**2) / 10000.0 + 30.054 * ratio_ave / 100.0 + 94.845
+        return spo2, True
+    return -999.0, False
+
+
+@numba.njit(cache=True)
+def _find_peaks(x, size, min_height, min_dist, max_num):
+    """
+    Find at most MAX_NUM peaks above MIN_HEIGHT separated by at least MIN_DISTANCE
+    """
+    ir_valley_locs, n_peaks = _find_peaks_above_min_height(x, size, min_height, max_num)
+    ir_valley_locs, n_peaks = _remove_close_peaks(n_peaks, ir_valley_locs, x, min_dist)
+
+    n_peaks = min(n_peaks, max_num)
+
+    return ir_valley_locs, n_peaks
+
+
+@numba.njit(cache=True)
+def _find_peaks_above_min_height(x, size, min_height, max_num):
+    """
+    Find all peaks above MIN_HEIGHT
+    """
+    i = 0
+    n_peaks = 0
+    ir_valley_locs = np.zeros(max_num, np.int64)
+    while i < size - 1:
+        # at i == 0 this compares against x[-1], as the reference does
+        if x[i] > min_height and x[i] > x[i-1]:  # find the left edge of potential peaks
+            n_width = 1
+            while i + n_width < size - 1 and x[i] == x[i+n_width]:  # find flat peaks
+                n_width += 1
+            if x[i] > x[i+n_width] and n_peaks < max_num:  # find the right edge of peaks
+                ir_valley_locs[n_peaks] = i
+                n_peaks += 1
+                i += n_width + 1
+            else:
+                i += n_width
+        else:
+            i += 1
+
+    return ir_valley_locs[:n_peaks], n_peaks
+
+
+@numba.njit(cache=True)
+def _remove_close_peaks(n_peaks, ir_valley_locs, x, min_dist):
+    """
+    Remove peaks separated by less than MIN_DISTANCE
+    """
+    # order peaks from large to small; a stable ascending sort reversed,
+    # so ties come out in the same order as the reference
+    heights = np.empty(n_peaks, np.int64)
+    for k in range(n_peaks):
+        heights[k] = x[ir_valley_locs[k]]
+    order = np.argsort(heights, kind='mergesort')[::-1]
+    sorted_indices = ir_valley_locs[order]
+
+    i = -1
+    while i < n_peaks:
+        old_n_peaks = n_peaks
+        n_peaks = i + 1
+        j = i + 1
+        while j < old_n_peaks:
+            if i != -1:
+                n_dist = sorted_indices[j] - sorted_indices[i]
+            else:
+                n_dist = sorted_indices[j] + 1  # lag-zero peak of autocorr is at index -1
+            if n_dist > min_dist or n_dist < -1 * min_dist:
+                sorted_indices[n_peaks] = sorted_indices[j]
+                n_peaks += 1
+            j += 1
+        i += 1
+
+    sorted_indices[:n_peaks] = np.sort(sorted_indices[:n_peaks])
+
+    return sorted_indices, n_peaks
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Check that hrcalc_numba gives exactly the same results as the reference hrcalc.
+
+Run after any change to either module:
+    python3 hrcalc_parity.py [windows]
+"""
+
+import math
+import random
+import sys
+
+import numpy as np
+
+import hrcalc
+import hrcalc_numba
+
+# MAX30102 samples are 18 bits wide
+SAMPLE_MAX = 0x3FFFF
+
+
+def make_window(rng):
+    """
+    One 100-sample ir/red window: a noisy PPG-like sine, or pure noise.
+    """
+    n = hrcalc.BUFFER_SIZE
+    if rng.random() < 0.15:
+        ir = [rng.randint(0, SAMPLE_MAX) for _ in range(n)]
+        red = [rng.randint(0, SAMPLE_MAX) for _ in range(n)]
+        return ir, red
+
+    freq = rng.uniform(0.6, 3.0)  # 36-180 bpm
+    phase = rng.uniform(0, 2 * math.pi)
+    amp = rng.choice([0, 50, 500, 2000, 5000])
+    red_gain = rng.uniform(0.3, 2.0)
+    dc = rng.choice([1000, 60000, 120000, 250000])
+    noise = rng.choice([0, 5, 50, 300])
+
+    def sample(base, gain, shift, i):
+        t = 2 * math.pi * freq * i / hrcalc.SAMPLE_FREQ + phase + shift
+        v = int(base + amp * gain * math.sin(t) + rng.gauss(0, noise))
+        return max(0, min(SAMPLE_MAX, v))
+
+    ir = [sample(dc, 1.0, 0.0, i) for i in range(n)]
+    red = [sample(dc * 0.9, red_gain, 0.1, i) for i in range(n)]
+    return ir, red
+
+
+def main(windows=3000, seed=1):
+    rng = random.Random(seed)
+    mismatches = 0
+    valid = 0
+    for w in range(windows):
+        ir, red = make_window(rng)
+        expected = tuple(hrcalc.calc_hr_and_spo2(ir, red))
+        valid += expected[1] and expected[3]
+
+        # store the window in a ring the way HeartRateMonitor does:
+        # oldest sample at `start`
+        start = w % hrcalc.BUFFER_SIZE
+        ir_ring = np.roll(np.array(ir, np.uint32), start)
+        red_ring = np.roll(np.array(red, np.uint32), start)
+        got = tuple(hrcalc_numba.calc_hr_and_spo2_ring(ir_ring, red_ring, start))
+
+        if got != expected:
+            mismatches += 1
+            if mismatches <= 5:
+                print("window {0} (start {1}): hrcalc {2}, numba {3}".format(w, start, expected, got))
+
+    print("{0} windows ({1} with valid HR and SpO2), {2} mismatches".format(windows, valid, mismatches))
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    sys.exit(0 if main(n) else 1)
@@ -3,7 +3,8 @@
 # this code is currently for python 2.7
 from __future__ import print_function
 from time import sleep
-import smbus
+import numpy as np
+from smbus2 import SMBus, i2c_msg
 
 # register addresses
 REG_INTR_STATUS_1 = 0x00
@@ -41,7 +42,7 @@ class MAX30102():
         #print("Channel: {0}, address: {1}".format(channel, address))
         self.address = address
         self.channel = channel
-        self.bus = smbus.SMBus(self.channel)
+        self.bus = SMBus(self.channel)
 
         self.reset()
 
@@ -99,6 +100,13 @@ class MAX30102():
         self.bus.write_i2c_block_data(self.address, REG_LED2_PA, [0x50])  # IR LED: 15mA (better signal)
         self.bus.write_i2c_block_data(self.address, REG_PILOT_PA, [0x7f])  # Pilot LED: 25mA (max)
 
+    def enable_fifo_full_interrupt(self):
+        """
+        Only assert INT when the FIFO is almost full (A_FULL), instead of
+        also on every new sample (PPG_RDY) as set up by setup().
+        """
+        self.bus.write_i2c_block_data(self.address, REG_INTR_ENABLE_1, [0x80])
+
     # this won't validate the arguments!
     # use when changing the values from default
     def set_config(self, reg, value):
@@ -108,6 +116,10 @@ class MAX30102():
         read_ptr = self.bus.read_byte_data(self.address, REG_FIFO_RD_PTR)
         write_ptr = self.bus.read_byte_data(self.address, REG_FIFO_WR_PTR)
         if read_ptr == write_ptr:
+            # equal pointers also mean a full FIFO once it has overflowed
+            # (rollover is off, see setup()), which OVF_COUNTER tells apart
+            if self.bus.read_byte_data(self.address, REG_OVF_COUNTER) > 0:
+                return 32
             return 0
         else:
             num_samples = write_ptr - read_ptr
@@ -136,6 +148,29 @@ class MAX30102():
 
         return red_led, ir_led
 
+    def clear_interrupts(self):
+        """
+        Read (and so clear) both interrupt status registers, releasing INT.
+        """
+        # read 1 byte from registers (values are discarded)
+        reg_INTR1 = self.bus.read_i2c_block_data(self.address, REG_INTR_STATUS_1, 1)
+        reg_INTR2 = self.bus.read_i2c_block_data(self.address, REG_INTR_STATUS_2, 1)
+
+    def read_fifo_raw(self, count):
+        """
+        Read `count` samples from the FIFO in a single I2C transfer.
+        Returns the undecoded bytes (6 per sample) as a read-only uint8 array.
+        """
+        self.clear_interrupts()
+
+        # FIFO_DATA does not auto-increment, so one long read drains `count` samples
+        # (this is over the 32 byte SMBus block limit, hence the raw i2c_rdwr)
+        write = i2c_msg.write(self.address, [REG_FIFO_DATA])
+        read = i2c_msg.read(self.address, 6 * count)
+        self.bus.i2c_rdwr(write, read)
+
+        return np.frombuffer(bytes(read), dtype=np.uint8)
+
     def read_sequential(self, amount=100):
         """
         This function will read the red-led and ir-led `amount` times.
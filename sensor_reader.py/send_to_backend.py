@@ -9,31 +9,69 @@ import hashlib
 import base64
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from heartrate_monitor import HeartRateMonitor
 from max30102 import MAX30102
 
+# orjson is optional; both paths produce compact UTF-8 bytes, which is also
+# how the backend re-serializes the body before checking the signature
+try:
+    from orjson import dumps as encode_body
+except ImportError:
+    def encode_body(payload):
+        return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
 # Configuration
 BACKEND_URL = "http://192.168.0.253:8080"  # Your laptop IP
 DEVICE_ID = "RPI-SENSOR-001"
 DEVICE_SECRET = "CHANGE_ME_DEVICE_SECRET"  # Must match backend config.toml
 READING_INTERVAL = 2  # seconds
+SENSOR_INT_PIN = None  # BCM GPIO wired to the MAX30102 INT pin, None to poll
 
 class BackendClient:
     def __init__(self, base_url, device_id, secret):
         self.base_url = base_url.rstrip('/')
         self.device_id = device_id
         self.secret = secret
+        # keyed HMAC with the inner/outer pad blocks already hashed;
+        # each signature starts from a copy of it
+        self._hmac = hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256)
+        self._vitals_url = f"{self.base_url}/api/device/vitals"
         self.session = requests.Session()
+        # let urllib3 retry gateway errors on the pooled connection; after the
+        # last try the response is returned as-is.
+        # read=0: never resend after a read error or timeout, since the request
+        # may already have reached device_ingest, which inserts on every call.
+        # Retry-After is ignored: the signed timestamp is only accepted for 60 s,
+        # so a longer server-requested wait could only block us and then fail.
+        # (allowed_methods needs urllib3 >= 1.26, see requirements.txt)
+        retry = Retry(
+            total=2,
+            read=0,
+            backoff_factor=0.2,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=["POST", "GET"],
+            raise_on_status=False,
+            respect_retry_after_header=False
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=4)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # static headers; requests merges them with the per-request ones
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "X-Device-Id": self.device_id
+        })
     
-    def generate_hmac_signature(self, timestamp, json_body):
-        """Generate HMAC-SHA256 signature for authentication"""
-        message = f"{timestamp}.{json_body}"
-        signature = hmac.new(
-            self.secret.encode('utf-8'),
-            message.encode('utf-8'),
-            hashlib.sha256
-        ).digest()
-        return base64.b64encode(signature).decode('utf-8')
+    def generate_hmac_signature(self, timestamp, body):
+        """Generate HMAC-SHA256 signature for authentication (body is the encoded JSON bytes)"""
+        # signed message is b"<timestamp>.<body>"; feed it in pieces rather
+        # than building the concatenated copy
+        mac = self._hmac.copy()
+        mac.update(b"%d." % timestamp)
+        mac.update(body)
+        return base64.b64encode(mac.digest()).decode('ascii')
     
     def send_vitals(self, heart_rate, spo2, temperature):
         """Send vitals to backend"""
@@ -46,21 +84,19 @@ class BackendClient:
             "timestamp": timestamp
         }
         
-        json_body = json.dumps(payload)
-        signature = self.generate_hmac_signature(timestamp, json_body)
+        body = encode_body(payload)
+        signature = self.generate_hmac_signature(timestamp, body)
         
         headers = {
-            "Content-Type": "application/json",
-            "X-Device-Id": self.device_id,
             "X-Timestamp": str(timestamp),
             "X-Signature": signature
         }
         
         try:
             response = self.session.post(
-                f"{self.base_url}/api/device/vitals",
+                self._vitals_url,
                 headers=headers,
-                data=json_body,
+                data=body,
                 timeout=10
             )
             
@@ -128,7 +164,7 @@ def main():
     
     # Initialize heart rate monitor
     print("\nInitializing MAX30102 sensor...")
-    monitor = HeartRateMonitor(print_raw=False, print_result=True)
+    monitor = HeartRateMonitor(print_raw=False, print_result=True, int_pin=SENSOR_INT_PIN)
     monitor.start_sensor()
     
     print("\n🚀 Monitoring started. Press Ctrl+C to stop.\n")
@@ -149,7 +185,7 @@ def main():
             # Only send real data if finger is detected
             if not finger_detected:
                 print("⏸️  No finger detected - place finger on sensor...")
-                time.sleep(READING_INTERVAL)
+                monitor.wait_for_reading(READING_INTERVAL)
                 continue
             
             # Get current readings from sensor
@@ -160,7 +196,7 @@ def main():
             # Require all valid readings (no zeros)
             if heart_rate == 0 or spo2 == 0 or temperature == 0:
                 print("⏸️  Waiting for stable readings...")
-                time.sleep(READING_INTERVAL)
+                monitor.wait_for_reading(READING_INTERVAL)
                 continue
             
             last_finger_state = True
@@ -0,0 +1,58 @@
+# -*-coding:utf-8
+
+import numba
+from numba import float64, int64, uint8, uint32
+
+_MeanStd = numba.types.UniTuple(float64, 2)
+
+
+@numba.njit(_MeanStd(uint32[:]), cache=True)
+def mean_std(a):
+    """
+    Mean and standard deviation of a sample window in a single pass.
+    Sums are accumulated as exact integers (18-bit samples cannot overflow
+    int64), so sum-of-squares minus square-of-sum loses no precision.
+    """
+    n = a.shape[0]
+    s = 0
+    sq = 0
+    for i in range(n):
+        v = int64(a[i])
+        s += v
+        sq += v * v
+
+    var = (n * sq - s * s) / (n * n)
+    return s / n, var ** 0.5
+
+
+@numba.njit(numba.types.UniTuple(float64, 4)(uint32[:], uint32[:]), cache=True)
+def finger_stats(ir, red):
+    """
+    Mean and standard deviation of the ir and red windows.
+    Returns (ir_mean, ir_std, red_mean, red_std).
+    """
+    ir_mean, ir_std = mean_std(ir)
+    red_mean, red_std = mean_std(red)
+    return ir_mean, ir_std, red_mean, red_std
+
+
+# raw FIFO burst as returned by MAX30102.read_fifo_raw()
+_FifoBytes = numba.types.Array(uint8, 1, 'C', readonly=True)
+
+
+@numba.njit(int64(_FifoBytes, uint32[:], uint32[:], int64), nogil=True, cache=True)
+def ingest(buf, ir_ring, red_ring, idx):
+    """
+    Decode a raw FIFO burst (6 bytes per sample: red then ir, 3 bytes each,
+    MSB first) straight into the ring buffers, starting at write index idx.
+    Returns the new write index. Runs without the GIL.
+    """
+    n = ir_ring.shape[0]
+    for o in range(0, buf.shape[0] - 5, 6):
+        # mask MSB [23:18]
+        red_ring[idx] = (int64(buf[o]) << 16 | int64(buf[o + 1]) << 8 | int64(buf[o + 2])) & 0x03FFFF
+        ir_ring[idx] = (int64(buf[o + 3]) << 16 | int64(buf[o + 4]) << 8 | int64(buf[o + 5])) & 0x03FFFF
+        idx += 1
+        if idx == n:
+            idx = 0
+    return idx
@@ -1,9 +1,17 @@
 from max30102 import MAX30102
 import hrcalc
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import numpy as np
 
+BACKEND_URL = 'http://127.0.0.1:8080/api/data'
+
+# One keep-alive session for the whole run so each send reuses the connection
+SESSION = requests.Session()
+SESSION.headers.update({'Connection': 'keep-alive'})
+SESSION.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
 # Initialize sensor
 sensor = MAX30102()
 
@@ -41,7 +49,7 @@ while True:
                         }
                         
                         try:
-                            response = requests.post('http://127.0.0.1:8080/api/data', json=data)
+                            response = SESSION.post(BACKEND_URL, json=data, timeout=5)
                             print(f"Sent: HR={bpm} bpm, SpO2={spo2}%")
                         except Exception as e:
                             print(f"Error sending data: {e}")